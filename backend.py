@@ -1,53 +1,436 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Response
 import yfinance as yf
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import pandas as pd
+import numpy as np
 from typing import Optional, List
 from datetime import datetime, timedelta
+from io import BytesIO
+import urllib.parse
+import asyncio
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
-from functools import lru_cache
+import threading
+from cachetools import TTLCache, cached
+import diskcache
+import httpx
+import orjson
+from contextlib import asynccontextmanager
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+
+# Shared HTTP session for the remaining yfinance calls (.info) -
+# reuses pooled connections and retries rate limits/5xx
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": USER_AGENT})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# TTL caches for historical data, keyed by (ticker, period, interval).
+# Intraday bars go stale quickly, daily and longer bars can be kept for an hour.
+# Entries are (data, expires_at) pairs: data reloaded from the disk cache only
+# lives as long as its original fetch allows, not a fresh full TTL.
+INTRADAY_TTL = 60
+DAILY_TTL = 3600
+INTRADAY_CACHE = TTLCache(maxsize=1000, ttl=INTRADAY_TTL)
+DAILY_CACHE = TTLCache(maxsize=1000, ttl=DAILY_TTL)
+CACHE_LOCK = threading.Lock()
+CACHE_STATS = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+def is_intraday(interval):
+    return interval.endswith(("m", "h"))
+
+def get_ttl(interval):
+    return INTRADAY_TTL if is_intraday(interval) else DAILY_TTL
+
+def get_cache_for(interval):
+    return INTRADAY_CACHE if is_intraday(interval) else DAILY_CACHE
+
+# Disk-backed cache for full endpoint payloads - survives restarts and is
+# shared by every worker process on the host. Stores the encoded JSON body so
+# cache hits are returned as-is without decoding. diskcache does blocking
+# SQLite I/O, so handlers call these helpers through asyncio.to_thread.
+# Payloads include the live price/rate/value/NAV, so they are never kept longer
+# than LIVE_TTL even when the underlying history is cached for an hour, and
+# never outlive that history.
+LIVE_TTL = 60
+RESPONSE_CACHE = diskcache.Cache(os.environ.get("RESPONSE_CACHE_DIR", "/tmp/stockcache/responses"))
+
+def get_cached_response(key):
+    return RESPONSE_CACHE.get(key)
+
+def set_cached_response(key, interval, body, data):
+    expires_at = data.attrs.get("expires_at", time.time() + get_ttl(interval))
+    expire = min(LIVE_TTL, expires_at - time.time())
+    if expire > 0:
+        RESPONSE_CACHE.set(key, body, expire=expire)
+
+# Disk-backed cache for parsed history DataFrames, stored as Feather bytes so
+# a restarted worker can reload them without hitting Yahoo again
+HISTORY_CACHE = diskcache.Cache(os.environ.get("HISTORY_CACHE_DIR", "/tmp/stockcache/history"))
+
+# Returns (df, expires_at), or (None, None) when the key is missing
+def load_cached_history(key):
+    raw, expires_at = HISTORY_CACHE.get(key, expire_time=True)
+    if raw is None:
+        return None, None
+    df = pd.read_feather(BytesIO(raw))
+    return df.set_index(df.columns[0]), expires_at
+
+def save_cached_history(key, df, expires_at):
+    buf = BytesIO()
+    df.reset_index().to_feather(buf)
+    HISTORY_CACHE.set(key, buf.getvalue(), expire=expires_at - time.time())
+
+# Encode a payload with the same options as ORJSONResponse
+def encode_json(content):
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def json_response(body):
+    return Response(content=body, media_type="application/json")
+
+# Rows per line when streaming historical data as NDJSON
+NDJSON_BATCH_SIZE = 500
+
+# Stream a payload as newline-delimited JSON: the metadata on the first line,
+# then the historical records in batches so large periods never have to be
+# serialized in one piece
+def ndjson_response(meta, data):
+    def generate():
+        yield orjson.dumps(meta, option=orjson.OPT_APPEND_NEWLINE)
+        for start in range(0, len(data), NDJSON_BATCH_SIZE):
+            batch = df_to_records(data.iloc[start:start + NDJSON_BATCH_SIZE])
+            yield orjson.dumps(batch, option=orjson.OPT_APPEND_NEWLINE)
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Ticker metadata changes rarely, so .info is cached for a few minutes. A new
+# Ticker is built on every miss: yfinance memoizes .info on the Ticker object,
+# so reusing one would keep serving the first response forever.
+@cached(TTLCache(maxsize=2048, ttl=300), lock=threading.Lock())
+def get_ticker_info(symbol):
+    return yf.Ticker(symbol, session=SESSION).info
+
+# Map a Yahoo ticker / exchange code to the exchange names used by /search
+def get_exchange_name(symbol, info):
+    if ".NS" in symbol:
+        return "NSE"
+    elif ".BO" in symbol:
+        return "BSE"
+    elif info.get('exchange') in ['NMS', 'NGS', 'NCM', 'NGM']:
+        return "NASDAQ"
+    elif info.get('exchange') in ['NYQ', 'PSE', 'PCX', 'ASE', 'AMX']:
+        return "NYSE"
+    return ""
+
+# Look up a single exact ticker on Yahoo, for symbols missing from the local
+# database. Returns a search result dict or None. Misses are cached too, so a
+# repeated unknown query doesn't go back to the network.
+SEARCH_QUOTE_TYPES = {"EQUITY": "stock", "MUTUALFUND": "mutual_fund"}
+
+@cached(TTLCache(maxsize=2048, ttl=DAILY_TTL), lock=threading.Lock())
+def lookup_symbol(symbol):
+    try:
+        info = get_ticker_info(symbol)
+    except Exception:
+        return None
+    result_type = SEARCH_QUOTE_TYPES.get(info.get('quoteType'))
+    if result_type is None:
+        return None
+    return {
+        "symbol": symbol,
+        "name": info.get('shortName', 'Unknown'),
+        "exchange": get_exchange_name(symbol, info),
+        "type": result_type
+    }
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+
+# Fetch historical bars straight from Yahoo's v8 chart endpoint with the shared
+# async HTTP/2 client. Returns a DataFrame shaped like yf.Ticker.history()
+# (Open/High/Low/Close/Volume/Dividends/Stock Splits indexed by exchange-local
+# time), with prices adjusted for dividends and splits like history()'s default
+# auto_adjust=True.
+async def fetch_chart(symbol, period, interval, client):
+    params = {"interval": interval, "includePrePost": "false", "events": "div,splits"}
+    if period in TIME_PERIODS:
+        start_date, end_date = get_date_range(period)
+        if start_date is None:
+            params["range"] = "max"
+        else:
+            params["period1"] = int(start_date.timestamp())
+            params["period2"] = int(end_date.timestamp())
+    else:
+        params["range"] = period
+
+    result = await fetch_chart_result(symbol, params, client)
+    return parse_chart(result, interval)
+
+# Retry policy for chart requests - same as the requests SESSION: up to 3
+# retries with exponential backoff on rate limits, 5xx and connection errors
+CHART_RETRIES = 3
+CHART_BACKOFF_FACTOR = 0.3
+CHART_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Request one symbol's chart and return its "result" entry (meta + series)
+async def fetch_chart_result(symbol, params, client):
+    url = YAHOO_CHART_URL.format(symbol=urllib.parse.quote(symbol, safe=""))
+    for attempt in range(CHART_RETRIES + 1):
+        last_attempt = attempt == CHART_RETRIES
+        try:
+            r = await client.get(url, params=params)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if r.status_code not in CHART_RETRY_STATUSES or last_attempt:
+                break
+        await asyncio.sleep(CHART_BACKOFF_FACTOR * (2 ** attempt))
+    r.raise_for_status()
+    chart = r.json()["chart"]
+    if chart.get("error"):
+        raise ValueError(chart["error"].get("description", "Unknown chart error"))
+    return chart["result"][0]
+
+# Last traded price from the chart metadata - one small request for a single
+# daily bar instead of the full .info scrape. Cached for LIVE_TTL so it stays
+# current without refetching on every request.
+LIVE_PRICE_CACHE = TTLCache(maxsize=2048, ttl=LIVE_TTL)
+
+async def get_live_price(symbol):
+    price = LIVE_PRICE_CACHE.get(symbol)
+    if price is not None:
+        return price
+    try:
+        result = await fetch_chart_result(symbol, {"range": "1d", "interval": "1d"}, app.state.http)
+        price = result["meta"].get("regularMarketPrice")
+    except Exception as e:
+        print(f"Error fetching live price for {symbol}: {e}")
+        return None
+    if price is not None:
+        LIVE_PRICE_CACHE[symbol] = price
+    return price
+
+def parse_chart(result, interval):
+    timestamps = result.get("timestamp") or []
+    quote = result["indicators"]["quote"][0] if timestamps else {}
+    tz = result["meta"].get("exchangeTimezoneName", "UTC")
+    index = to_bar_index(timestamps, tz, interval)
+    columns = {}
+    for field in ("open", "high", "low", "close", "volume"):
+        values = quote.get(field) or [None] * len(index)
+        columns[field.capitalize()] = np.array(values, dtype="float64")
+
+    # Scale OHLC by adjclose / close, the same adjustment yfinance applies.
+    # Intraday charts carry no adjclose and are returned as-is.
+    adjclose = result["indicators"].get("adjclose") if timestamps else None
+    if adjclose and adjclose[0].get("adjclose"):
+        adj = np.array(adjclose[0]["adjclose"], dtype="float64")
+        ratio = adj / columns["Close"]
+        for field in ("Open", "High", "Low"):
+            columns[field] = columns[field] * ratio
+        columns["Close"] = adj
+    df = pd.DataFrame(columns, index=index)
+
+    # Same cleanup as history(): Yahoo can append the live bar as a separate
+    # row with the same date, so keep only the latest row per timestamp, and
+    # drop holidays / missing bars that come back with no prices at all
+    df = df[~df.index.duplicated(keep="last")]
+    df = df.dropna(how="all", subset=["Open", "High", "Low", "Close"])
+    df["Volume"] = df["Volume"].fillna(0).astype("int64")
+
+    # Dividend and split events, as the Dividends / Stock Splits columns
+    events = result.get("events") or {}
+    df["Dividends"] = events_to_series(
+        events.get("dividends"), lambda e: e["amount"], tz, interval, df.index
+    )
+    df["Stock Splits"] = events_to_series(
+        events.get("splits"), lambda e: e["numerator"] / e["denominator"], tz, interval, df.index
+    )
+    return df
+
+# Convert epoch seconds to the bar index: exchange-local time, with daily and
+# longer bars (stamped at the session open) aligned to midnight like yfinance
+def to_bar_index(timestamps, tz, interval):
+    index = pd.to_datetime(timestamps, unit="s", utc=True).tz_convert(tz)
+    if is_intraday(interval):
+        index.name = "Datetime"
+    else:
+        index = index.normalize()
+        index.name = "Date"
+    return index
+
+# Place chart events ({ts: {...}}) on the bars they fall on, 0.0 elsewhere
+def events_to_series(events, value, tz, interval, index):
+    if not events:
+        return np.zeros(len(index))
+    items = list(events.values())
+    series = pd.Series(
+        [value(e) for e in items],
+        index=to_bar_index([e["date"] for e in items], tz, interval),
+        dtype="float64"
+    )
+    series = series.groupby(level=0).sum()
+    return series.reindex(index, fill_value=0.0).to_numpy()
 
 # Cache to store responses and avoid redundant API calls
-@lru_cache(maxsize=1000)
-def get_stock_data(ticker, period="1d", interval="1h"):
+async def get_stock_data(ticker, period="1d", interval="1h"):
+    key = (ticker, period, interval)
+    cache = get_cache_for(interval)
+    with CACHE_LOCK:
+        entry = cache.get(key)
+        if entry is not None and entry[1] > time.time():
+            CACHE_STATS["hits"] += 1
+            return entry[0]
+
+    # Fall back to the on-disk copy before going to the network. Feather
+    # decoding and the SQLite-backed diskcache run off the event loop.
+    disk_key = f"history:{ticker}:{period}:{interval}"
     try:
-        stock = yf.Ticker(ticker)
-        data = stock.history(period=period, interval=interval)
+        data, expires_at = await asyncio.to_thread(load_cached_history, disk_key)
+    except Exception as e:
+        print(f"Error reading cached history for {ticker}: {e}")
+        data = None
+
+    if data is not None and expires_at is not None:
+        data.attrs["expires_at"] = expires_at
+        with CACHE_LOCK:
+            CACHE_STATS["disk_hits"] += 1
+            cache[key] = (data, expires_at)
         return data
+
+    with CACHE_LOCK:
+        CACHE_STATS["misses"] += 1
+
+    try:
+        data = await fetch_chart(ticker, period, interval, app.state.http)
     except Exception as e:
         print(f"Error fetching data for {ticker}: {e}")
         return None
 
-# Fetch multiple tickers in a batch - more efficient than individual requests
-def get_multiple_stocks(tickers, period="1d", interval="1h"):
+    expires_at = time.time() + get_ttl(interval)
+    data.attrs["expires_at"] = expires_at
+    if not data.empty:
+        try:
+            await asyncio.to_thread(save_cached_history, disk_key, data, expires_at)
+        except Exception as e:
+            print(f"Error caching history for {ticker}: {e}")
+
+    with CACHE_LOCK:
+        cache[key] = (data, expires_at)
+    return data
+
+# Convert a DatetimeIndex to epoch milliseconds in one vectorized pass, instead
+# of boxing a pd.Timestamp per row. Clients parse these with new Date(ms).
+# Daily and longer bars (index named "Date" by parse_chart) are emitted as the
+# exchange-local calendar date at 00:00 UTC, the same convention /compare uses,
+# so a bar shows the same day for every client regardless of timezone.
+# Intraday bars ("Datetime") keep their real UTC instant.
+def datetimes_to_list(values):
+    if values.name == "Date" and values.tz is not None:
+        values = values.tz_localize(None)
+    return values.as_unit("ms").asi8.tolist()
+
+# Price columns are quantized before serialization - yfinance returns float64
+# values like 185.63999938964844 which are mostly noise digits on the wire.
+# Rounding to float32-level precision (7 significant digits) keeps small
+# values such as JPY/USD=X (~0.0067) or penny stocks intact.
+PRICE_COLUMNS = {"Open", "High", "Low", "Close", "Adj Close"}
+PRICE_SIGNIFICANT_DIGITS = 7
+
+# Round an array to a number of significant digits in one vectorized pass
+def round_significant(arr, digits=PRICE_SIGNIFICANT_DIGITS):
+    arr = np.asarray(arr, dtype="float64")
+    finite = np.isfinite(arr) & (arr != 0)
+    magnitude = np.zeros_like(arr)
+    magnitude[finite] = np.floor(np.log10(np.abs(arr[finite])))
+    decimals = digits - 1 - magnitude
+    # Scale by exact powers of ten: multiply for fractional digits, divide for
+    # large magnitudes, so the result is the nearest double to the short value
+    up = np.power(10.0, np.maximum(decimals, 0))
+    down = np.power(10.0, np.maximum(-decimals, 0))
+    rounded = np.round(arr * up / down) * down / up
+    return np.where(finite, rounded, arr)
+
+# Convert one column to a list of native Python values
+def column_to_list(col, series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return datetimes_to_list(pd.DatetimeIndex(series))
+    arr = series.to_numpy()
+    if col in PRICE_COLUMNS:
+        arr = round_significant(arr)
+    return arr.tolist()
+
+# Convert a DataFrame to a list of row dicts, one vectorized tolist() per column
+# instead of boxing every cell individually like to_dict(orient="records")
+def df_to_records(df):
+    df = df.reset_index()
+    cols = df.columns.tolist()
+    arrs = [column_to_list(col, df[col]) for col in cols]
+    return [dict(zip(cols, row)) for row in zip(*arrs)]
+
+# Convert a DataFrame to a dict of column lists (the index is left out)
+def df_to_columns(df):
+    return {col: column_to_list(col, df[col]) for col in df.columns}
+
+# Per-worker startup/shutdown. Opens one async HTTP/2 client for all chart
+# requests - many concurrent fetches are multiplexed over a few pooled
+# connections - and kicks off cache warming in the background so startup is
+# not blocked. Every worker runs this, but only the first one to claim the
+# marker key in the shared history cache actually warms; the rest read the
+# results from disk.
+@asynccontextmanager
+async def lifespan(app):
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=10.0
+    )
+    app.state.warm_task = None
+    if HISTORY_CACHE.add(WARM_MARKER_KEY, os.getpid(), expire=DAILY_TTL):
+        app.state.warm_task = asyncio.create_task(warm_cache())
     try:
-        # Use yf.download instead of individual requests
-        data = yf.download(" ".join(tickers), period=period, interval=interval, group_by='ticker')
-        results = {}
-        
-        for ticker in tickers:
-            if len(tickers) > 1:
-                results[ticker] = data[ticker]
-            else:
-                results[ticker] = data
-        
-        return results
-    except Exception as e:
-        print(f"Error fetching multiple stocks: {e}")
-        return None
+        yield
+    finally:
+        # Stop any in-flight cache warming before its client goes away
+        warm_task = app.state.warm_task
+        if warm_task is not None and not warm_task.done():
+            warm_task.cancel()
+            try:
+                await warm_task
+            except asyncio.CancelledError:
+                pass
+        await app.state.http.aclose()
 
 # Initialize FastAPI app
 app = FastAPI(title="Enhanced Financial Data API",
-              description="Comprehensive API for stocks, forex, mutual funds, and index funds data")
+              description="Comprehensive API for stocks, forex, mutual funds, and index funds data",
+              default_response_class=ORJSONResponse,
+              lifespan=lifespan)
 
-# Enable CORS for frontend requests
+# Enable CORS for frontend requests. FRONTEND_ORIGIN takes a comma-separated
+# list of allowed origins ("*" allows any). Preflight responses are cached by
+# the browser for a day so cross-origin GETs don't pay an extra round trip.
+FRONTEND_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get("FRONTEND_ORIGIN", "http://localhost:3000").split(",")
+    if origin.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Change to your frontend URL for production
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET"],
+    allow_headers=["Content-Type"],
+    max_age=86400,
 )
 
 # Constants for time periods
@@ -55,7 +438,7 @@ TIME_PERIODS = {
     "30d": 30,
     "90d": 90,
     "1y": 365,
-    "all": None  # None will use max available data in yfinance
+    "all": None  # None will use max available data from Yahoo
 }
 
 # Exchange suffix mapping
@@ -86,6 +469,92 @@ FOREX_MAPPING = {
     "jpy_usd": "JPY/USD=X"
 }
 
+# Local symbol database used by /search - columns: symbol, name, exchange, type.
+# symbols.csv is the source of truth; symbols.feather is a generated copy that
+# is much faster to load. It is only used while it is at least as new as the
+# CSV, otherwise the CSV is read and the Feather copy is rebuilt from it.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SYMBOLS_FEATHER_PATH = os.path.join(BASE_DIR, "symbols.feather")
+SYMBOLS_CSV_PATH = os.path.join(BASE_DIR, "symbols.csv")
+
+def load_symbols():
+    if (os.path.exists(SYMBOLS_FEATHER_PATH)
+            and os.path.getmtime(SYMBOLS_FEATHER_PATH) >= os.path.getmtime(SYMBOLS_CSV_PATH)):
+        return pd.read_feather(SYMBOLS_FEATHER_PATH)
+
+    df = pd.read_csv(SYMBOLS_CSV_PATH, dtype=str, keep_default_na=False)
+    # Several workers may rebuild at once on a fresh deploy: write to a private
+    # temp file and atomically swap it in so nobody reads a half-written file
+    tmp_path = f"{SYMBOLS_FEATHER_PATH}.{os.getpid()}.tmp"
+    try:
+        df.to_feather(tmp_path, compression="zstd")
+        os.replace(tmp_path, SYMBOLS_FEATHER_PATH)
+    except Exception as e:
+        print(f"Error writing {SYMBOLS_FEATHER_PATH}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
+
+SYMBOLS_DF = load_symbols()
+
+# Popular Indian mutual funds by category.
+# This would ideally come from a database, but for demonstration:
+POPULAR_FUNDS = {
+    "equity": [
+        {"name": "HDFC Top 100 Fund", "symbol": "0P0000XVOI.BO"},
+        {"name": "SBI Bluechip Fund", "symbol": "0P0000YCNI.BO"},
+        {"name": "Axis Bluechip Fund", "symbol": "0P0000Z5X9.BO"},
+        {"name": "Mirae Asset Large Cap Fund", "symbol": "0P0000YD2F.BO"}
+    ],
+    "debt": [
+        {"name": "HDFC Corporate Bond Fund", "symbol": "0P0000YWLG.BO"},
+        {"name": "SBI Corporate Bond Fund", "symbol": "0P0000ZM1O.BO"},
+        {"name": "Kotak Corporate Bond Fund", "symbol": "0P0000Y5QE.BO"}
+    ],
+    "hybrid": [
+        {"name": "ICICI Prudential Balanced Advantage Fund", "symbol": "0P0000XVE2.BO"},
+        {"name": "HDFC Balanced Advantage Fund", "symbol": "0P0000XV7Y.BO"}
+    ]
+}
+
+# The fund list is static, so the response bodies are encoded once at import
+POPULAR_FUNDS_JSON = {cat: encode_json({"funds": funds}) for cat, funds in POPULAR_FUNDS.items()}
+ALL_FUNDS_JSON = encode_json({"funds": POPULAR_FUNDS})
+
+# Lowercased (key, symbol) pairs precomputed for /search
+FOREX_LOWER = [(key.lower(), symbol.lower(), symbol) for key, symbol in FOREX_MAPPING.items()]
+INDICES_LOWER = [(key.lower(), symbol.lower(), key, symbol) for key, symbol in INDICES_MAPPING.items()]
+
+# Display names for known index symbols, e.g. "^NSEI" -> "Nifty50"
+INDEX_NAMES = {symbol: key.capitalize() for key, symbol in INDICES_MAPPING.items()}
+
+# Frequently requested stocks to pre-fetch at startup
+POPULAR_STOCKS = [
+    "AAPL", "MSFT", "GOOGL", "AMZN", "TSLA",
+    "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS"
+]
+
+# Periods to pre-fetch for each popular symbol
+WARM_PERIODS = ["30d", "90d", "1y"]
+WARM_BATCH_SIZE = 5
+
+# Pre-fetch one batch of symbols into the history cache concurrently
+async def warm_batch(symbols, period, interval="1d"):
+    await asyncio.gather(
+        *[get_stock_data(sym, period, interval) for sym in symbols],
+        return_exceptions=True
+    )
+
+# Warm the history cache for indices, forex pairs and popular stocks
+async def warm_cache():
+    symbols = list(INDICES_MAPPING.values()) + list(FOREX_MAPPING.values()) + POPULAR_STOCKS
+    for period in WARM_PERIODS:
+        for i in range(0, len(symbols), WARM_BATCH_SIZE):
+            await warm_batch(symbols[i:i + WARM_BATCH_SIZE], period)
+
+# Marker claimed in the shared history cache by the one worker that warms
+WARM_MARKER_KEY = "warm:marker"
+
 # Helper function to calculate date range from period
 def get_date_range(period):
     days = TIME_PERIODS.get(period, 90)
@@ -114,44 +583,35 @@ def search_instruments(
     type: Optional[str] = Query(None, description="Filter by type: stock, forex, index, mutual_fund")
 ):
     try:
-        # For production, better search API options:
-        # 1. Alpha Vantage Symbol Search
-        # 2. Yahoo Finance API through RapidAPI
-        # 3. Custom database with pre-loaded symbols and names
-        
-        # Basic implementation using yfinance
+        # Stock and mutual fund search runs against the local symbol database,
+        # with a Yahoo lookup for exact tickers it doesn't contain
         results = []
-        
-        # Add stock search
-        if type is None or type == "stock":
-            tickers = yf.Tickers(query)
-            for ticker_name, ticker_obj in tickers.tickers.items():
-                try:
-                    info = ticker_obj.info
-                    exchange = ""
-                    if ".NS" in ticker_name:
-                        exchange = "NSE"
-                    elif ".BO" in ticker_name:
-                        exchange = "BSE"
-                    elif info.get('exchange') in ['NMS', 'NGS', 'NCM', 'NGM']:
-                        exchange = "NASDAQ"
-                    elif info.get('exchange') in ['NYQ', 'PSE', 'PCX', 'ASE', 'AMX']:
-                        exchange = "NYSE"
-                        
-                    if info.get('quoteType') == 'EQUITY':
-                        results.append({
-                            "symbol": ticker_name,
-                            "name": info.get('shortName', 'Unknown'),
-                            "exchange": exchange,
-                            "type": "stock"
-                        })
-                except:
-                    continue
+        q = query.lower()
+        
+        # Add stock / mutual fund search
+        if type is None or type in ("stock", "mutual_fund"):
+            matches = SYMBOLS_DF
+            if type is not None:
+                matches = matches[matches["type"] == type]
+            mask = (
+                matches["name"].str.contains(query, case=False, regex=False)
+                | matches["symbol"].str.contains(query, case=False, regex=False)
+            )
+            local_results = matches[mask].head(limit).to_dict(orient="records")
+            results.extend(local_results)
+            
+            # Only when nothing matched locally, an exact ticker such as "F"
+            # is resolved on Yahoo
+            symbol = query.strip().upper()
+            if not local_results and symbol and " " not in symbol:
+                found = lookup_symbol(symbol)
+                if found and (type is None or found["type"] == type):
+                    results.insert(0, found)
         
         # Add forex search
         if type is None or type == "forex":
-            for key, symbol in FOREX_MAPPING.items():
-                if query.lower() in key or query.lower() in symbol.lower():
+            for key_lower, symbol_lower, symbol in FOREX_LOWER:
+                if q in key_lower or q in symbol_lower:
                     results.append({
                         "symbol": symbol,
                         "name": symbol.replace("=X", ""),
@@ -160,8 +620,8 @@ def search_instruments(
         
         # Add index search
         if type is None or type == "index":
-            for key, symbol in INDICES_MAPPING.items():
-                if query.lower() in key or query.lower() in symbol.lower():
+            for key_lower, symbol_lower, key, symbol in INDICES_LOWER:
+                if q in key_lower or q in symbol_lower:
                     results.append({
                         "symbol": symbol,
                         "name": key.capitalize(),
@@ -169,16 +629,19 @@ def search_instruments(
                     })
         
         return {"results": results[:limit]}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ 3️⃣ Get Stock Data (with exchange support)
 @app.get("/stock/{symbol}")
-def get_stock_data_endpoint(
+async def get_stock_data_endpoint(
     symbol: str,
     period: Optional[str] = Query("90d", description="Time period: 30d, 90d, 1y, all"),
     interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo"),
-    exchange: Optional[str] = Query(None, description="Exchange: nse, bse")
+    exchange: Optional[str] = Query(None, description="Exchange: nse, bse"),
+    format: Optional[str] = Query("json", description="Response format: json, ndjson")
 ):
     try:
         # Add exchange suffix if specified
@@ -186,175 +649,193 @@ def get_stock_data_endpoint(
             if not symbol.endswith(EXCHANGE_MAPPING[exchange.lower()]):
                 symbol = symbol + EXCHANGE_MAPPING[exchange.lower()]
         
-        # Use the cached function to get data
-        start_date, end_date = get_date_range(period)
+        # Serve the full payload from the response cache if we have it
+        cache_key = f"stock:{symbol}:{period}:{interval}"
+        if format != "ndjson" and (cached := await asyncio.to_thread(get_cached_response, cache_key)) is not None:
+            return json_response(cached)
         
-        # Try to get from cache first
-        data = get_stock_data(symbol, period=period, interval=interval)
-        if data is None:
-            stock = yf.Ticker(symbol)
-            data = stock.history(start=start_date, end=end_date, interval=interval)
+        # Fetch stock info and historical data (cached) concurrently
+        info, data = await asyncio.gather(
+            asyncio.to_thread(get_ticker_info, symbol),
+            get_stock_data(symbol, period, interval)
+        )
         
-        # Get stock info
-        stock = yf.Ticker(symbol)
-        info = stock.info
         name = info.get('shortName', 'Unknown')
         sector = info.get('sector', 'Unknown')
         market_cap = info.get('marketCap', 'Unknown')
         
-        if data.empty:
+        if data is None or data.empty:
             raise HTTPException(status_code=404, detail=f"No data found for {symbol}.")
         
         # Get current/live price
         live_price = info.get('currentPrice', info.get('regularMarketPrice', None))
         
         # Format response
-        return {
+        result = {
             "symbol": symbol,
             "name": name,
             "sector": sector,
             "market_cap": market_cap,
             "live_price": live_price,
             "period": period,
-            "interval": interval,
-            "data": data.reset_index().to_dict(orient="records")
+            "interval": interval
         }
+        if format == "ndjson":
+            return ndjson_response(result, data)
+        result["data"] = df_to_records(data)
+        body = encode_json(result)
+        await asyncio.to_thread(set_cached_response, cache_key, interval, body, data)
+        return json_response(body)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ 4️⃣ Get Forex Data
 @app.get("/forex/{pair}")
-def get_forex_data(
+async def get_forex_data(
     pair: str,
     period: Optional[str] = Query("90d", description="Time period: 30d, 90d, 1y, all"),
-    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo")
+    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo"),
+    format: Optional[str] = Query("json", description="Response format: json, ndjson")
 ):
     try:
         # Map common forex pair names
         symbol = FOREX_MAPPING.get(pair.lower(), pair)
         if not symbol.endswith('=X'):
             symbol = symbol + '=X'
-            
-        forex = yf.Ticker(symbol)
         
-        # Get forex info
-        info = forex.info
-        name = info.get('shortName', symbol)
-        
-        # Get date range
-        start_date, end_date = get_date_range(period)
-        
-        # Get historical data
-        data = get_stock_data(symbol, period=period, interval=interval)
-        if data is None:
-            data = forex.history(start=start_date, end=end_date, interval=interval)
-        
-        if data.empty:
+        # Serve the full payload from the response cache if we have it
+        cache_key = f"forex:{symbol}:{period}:{interval}"
+        if format != "ndjson" and (cached := await asyncio.to_thread(get_cached_response, cache_key)) is not None:
+            return json_response(cached)
+            
+        # Fetch live rate and historical data (cached) concurrently
+        live_rate, data = await asyncio.gather(
+            get_live_price(symbol),
+            get_stock_data(symbol, period, interval)
+        )
+        name = symbol.replace("=X", "")
+        
+        if data is None or data.empty:
             raise HTTPException(status_code=404, detail=f"No data found for forex pair {pair}.")
         
-        # Get current/live price
-        live_rate = info.get('regularMarketPrice', None)
-        
         # Format response
-        return {
+        result = {
             "symbol": symbol,
             "name": name,
             "live_rate": live_rate,
             "period": period,
-            "interval": interval,
-            "data": data.reset_index().to_dict(orient="records")
+            "interval": interval
         }
+        if format == "ndjson":
+            return ndjson_response(result, data)
+        result["data"] = df_to_records(data)
+        body = encode_json(result)
+        await asyncio.to_thread(set_cached_response, cache_key, interval, body, data)
+        return json_response(body)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ 5️⃣ Get Index Data
 @app.get("/index/{symbol}")
-def get_index_data(
+async def get_index_data(
     symbol: str,
     period: Optional[str] = Query("90d", description="Time period: 30d, 90d, 1y, all"),
-    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo")
+    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo"),
+    format: Optional[str] = Query("json", description="Response format: json, ndjson")
 ):
     # Map from common names to actual symbols
     actual_symbol = INDICES_MAPPING.get(symbol.lower(), symbol)
     
     try:
-        index = yf.Ticker(actual_symbol)
-        
-        # Get index info
-        info = index.info
-        name = info.get('shortName', actual_symbol)
-        
-        # Get date range
-        start_date, end_date = get_date_range(period)
-        
-        # Get historical data
-        data = get_stock_data(actual_symbol, period=period, interval=interval)
-        if data is None:
-            data = index.history(start=start_date, end=end_date, interval=interval)
-        
-        if data.empty:
+        # Serve the full payload from the response cache if we have it
+        cache_key = f"index:{actual_symbol}:{period}:{interval}"
+        if format != "ndjson" and (cached := await asyncio.to_thread(get_cached_response, cache_key)) is not None:
+            return json_response(cached)
+        
+        # Fetch live value and historical data (cached) concurrently
+        live_value, data = await asyncio.gather(
+            get_live_price(actual_symbol),
+            get_stock_data(actual_symbol, period, interval)
+        )
+        name = INDEX_NAMES.get(actual_symbol, actual_symbol)
+        
+        if data is None or data.empty:
             raise HTTPException(status_code=404, detail=f"No data found for index {symbol}.")
         
-        # Get current/live value
-        live_value = info.get('regularMarketPrice', None)
-        
         # Format response
-        return {
+        result = {
             "symbol": actual_symbol,
             "name": name,
             "live_value": live_value,
             "period": period,
-            "interval": interval,
-            "data": data.reset_index().to_dict(orient="records")
+            "interval": interval
         }
+        if format == "ndjson":
+            return ndjson_response(result, data)
+        result["data"] = df_to_records(data)
+        body = encode_json(result)
+        await asyncio.to_thread(set_cached_response, cache_key, interval, body, data)
+        return json_response(body)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ 6️⃣ Get Mutual Fund Data
 @app.get("/mutual-fund/{symbol}")
-def get_mutual_fund_data(
+async def get_mutual_fund_data(
     symbol: str,
     period: Optional[str] = Query("90d", description="Time period: 30d, 90d, 1y, all"),
-    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo")
+    interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo"),
+    format: Optional[str] = Query("json", description="Response format: json, ndjson")
 ):
     try:
-        fund = yf.Ticker(symbol)
-        
-        # Get fund info
-        info = fund.info
+        # Serve the full payload from the response cache if we have it
+        cache_key = f"mutual-fund:{symbol}:{period}:{interval}"
+        if format != "ndjson" and (cached := await asyncio.to_thread(get_cached_response, cache_key)) is not None:
+            return json_response(cached)
+        
+        # Fetch fund info and historical data (cached) concurrently
+        info, data = await asyncio.gather(
+            asyncio.to_thread(get_ticker_info, symbol),
+            get_stock_data(symbol, period, interval)
+        )
         name = info.get('shortName', 'Unknown')
         category = info.get('category', 'Unknown')
         
-        # Get date range
-        start_date, end_date = get_date_range(period)
-        
-        # Get historical data
-        data = get_stock_data(symbol, period=period, interval=interval)
-        if data is None:
-            data = fund.history(start=start_date, end=end_date, interval=interval)
-        
-        if data.empty:
+        if data is None or data.empty:
             raise HTTPException(status_code=404, detail=f"No data found for mutual fund {symbol}.")
         
         # Get current/live NAV
         live_nav = info.get('regularMarketPrice', None)
         
         # Format response
-        return {
+        result = {
             "symbol": symbol,
             "name": name,
             "category": category,
             "live_nav": live_nav,
             "period": period,
-            "interval": interval,
-            "data": data.reset_index().to_dict(orient="records")
+            "interval": interval
         }
+        if format == "ndjson":
+            return ndjson_response(result, data)
+        result["data"] = df_to_records(data)
+        body = encode_json(result)
+        await asyncio.to_thread(set_cached_response, cache_key, interval, body, data)
+        return json_response(body)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ✅ 7️⃣ Compare Multiple Instruments (Stocks, Indices, Forex, Mutual Funds)
 @app.get("/compare/")
-def compare_instruments(
+async def compare_instruments(
     symbols: str = Query(..., description="Comma-separated list of symbols to compare"),
     period: Optional[str] = Query("90d", description="Time period: 30d, 90d, 1y, all"),
     interval: Optional[str] = Query("1d", description="Data interval: 1d, 1wk, 1mo")
@@ -362,57 +843,54 @@ def compare_instruments(
     symbol_list = [s.strip() for s in symbols.split(',')]
     
     try:
-        # Get date range
-        start_date, end_date = get_date_range(period)
-        
-        # Use the optimized get_multiple_stocks function for batch fetching
         if len(symbol_list) > 1:
-            result = get_multiple_stocks(symbol_list, period=period, interval=interval)
+            # Fetch every symbol concurrently over the shared HTTP/2 client
+            frames = await asyncio.gather(*[get_stock_data(s, period, interval) for s in symbol_list])
+            # Daily and longer bars are aligned on the calendar date, since each
+            # exchange stamps them at its own local midnight; intraday bars are
+            # aligned on the real UTC instant
+            if is_intraday(interval):
+                align = lambda df: df.tz_convert("UTC")
+            else:
+                align = lambda df: df.tz_localize(None)
+            result = {
+                sym: align(df)
+                for sym, df in zip(symbol_list, frames)
+                if df is not None and not df.empty
+            }
             
             if not result:
-                # Fallback to yf.download
-                data = yf.download(symbol_list, start=start_date, end=end_date, interval=interval)
-                
-                if data.empty:
-                    raise HTTPException(status_code=404, detail="No data found for the specified symbols.")
-                
-                # Format the multi-level columns for easier consumption
-                result = {}
-                for field in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                    if field in data.columns.levels[0]:
-                        field_data = data[field].reset_index()
-                        result[field] = field_data.to_dict(orient="records")
-                
-                return {
-                    "symbols": symbol_list,
-                    "period": period,
-                    "interval": interval,
-                    "data": result
-                }
-            else:
-                # Format the data from get_multiple_stocks
-                formatted_result = {}
-                for ticker, ticker_data in result.items():
-                    formatted_result[ticker] = ticker_data.reset_index().to_dict(orient="records")
-                
-                return {
-                    "symbols": symbol_list,
-                    "period": period,
-                    "interval": interval,
-                    "data": formatted_result
-                }
+                raise HTTPException(status_code=404, detail="No data found for the specified symbols.")
+            
+            # Align all symbols on one date index, so the dates are emitted once
+            # and each ticker gets its columns as lists
+            data = pd.concat(result, axis=1)
+            dates = datetimes_to_list(data.index)
+            formatted_result = {}
+            for ticker in result:
+                formatted_result[ticker] = df_to_columns(data[ticker])
+            
+            return ORJSONResponse({
+                "symbols": symbol_list,
+                "period": period,
+                "interval": interval,
+                "dates": dates,
+                "data": formatted_result
+            })
         else:
             # For single symbol, reuse get_stock_data
-            data = get_stock_data(symbol_list[0], period=period, interval=interval)
-            if data is None:
-                data = yf.Ticker(symbol_list[0]).history(start=start_date, end=end_date, interval=interval)
+            data = await get_stock_data(symbol_list[0], period, interval)
+            if data is None or data.empty:
+                raise HTTPException(status_code=404, detail=f"No data found for {symbol_list[0]}.")
             
-            return {
+            return ORJSONResponse({
                 "symbol": symbol_list[0],
                 "period": period,
                 "interval": interval,
-                "data": data.reset_index().to_dict(orient="records")
-            }
+                "data": df_to_records(data)
+            })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -421,34 +899,29 @@ def compare_instruments(
 def get_popular_indian_mutual_funds(
     category: Optional[str] = Query(None, description="Fund category: equity, debt, hybrid, etc.")
 ):
-    # This would ideally come from a database, but for demonstration:
-    popular_funds = {
-        "equity": [
-            {"name": "HDFC Top 100 Fund", "symbol": "0P0000XVOI.BO"},
-            {"name": "SBI Bluechip Fund", "symbol": "0P0000YCNI.BO"},
-            {"name": "Axis Bluechip Fund", "symbol": "0P0000Z5X9.BO"},
-            {"name": "Mirae Asset Large Cap Fund", "symbol": "0P0000YD2F.BO"}
-        ],
-        "debt": [
-            {"name": "HDFC Corporate Bond Fund", "symbol": "0P0000YWLG.BO"},
-            {"name": "SBI Corporate Bond Fund", "symbol": "0P0000ZM1O.BO"},
-            {"name": "Kotak Corporate Bond Fund", "symbol": "0P0000Y5QE.BO"}
-        ],
-        "hybrid": [
-            {"name": "ICICI Prudential Balanced Advantage Fund", "symbol": "0P0000XVE2.BO"},
-            {"name": "HDFC Balanced Advantage Fund", "symbol": "0P0000XV7Y.BO"}
-        ]
-    }
-    
-    if category and category.lower() in popular_funds:
-        return {"funds": popular_funds[category.lower()]}
+    if category and category.lower() in POPULAR_FUNDS_JSON:
+        return json_response(POPULAR_FUNDS_JSON[category.lower()])
     else:
-        return {"funds": {cat: funds for cat, funds in popular_funds.items()}}
+        return json_response(ALL_FUNDS_JSON)
+
+# ✅ 9️⃣ Cache Statistics (for debugging)
+@app.get("/cache-info")
+def cache_info():
+    with CACHE_LOCK:
+        return {
+            "hits": CACHE_STATS["hits"],
+            "disk_hits": CACHE_STATS["disk_hits"],
+            "misses": CACHE_STATS["misses"],
+            "intraday": {"size": len(INTRADAY_CACHE), "maxsize": INTRADAY_CACHE.maxsize, "ttl": INTRADAY_CACHE.ttl},
+            "daily": {"size": len(DAILY_CACHE), "maxsize": DAILY_CACHE.maxsize, "ttl": DAILY_CACHE.ttl}
+        }
 
 # Run FastAPI server
 if __name__ == "__main__":
     import uvicorn
-    import os
 
     port = int(os.environ.get("PORT", 10000))  # Use Render’s PORT or default 10000
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Several worker processes so one slow yfinance call doesn't stall every request
+    # Same default as the procfile
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+    uvicorn.run("backend:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,14 @@
+import os
+import pandas as pd
+
+# Convert the symbol listing CSV into the Feather file loaded by backend.py.
+# Run as a build/deploy step; backend.py also rebuilds it on startup whenever
+# symbols.csv is newer than the generated file.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, "symbols.csv")
+FEATHER_PATH = os.path.join(BASE_DIR, "symbols.feather")
+
+if __name__ == "__main__":
+    df = pd.read_csv(CSV_PATH, dtype=str, keep_default_na=False)
+    df.to_feather(FEATHER_PATH, compression="zstd")
+    print(f"Wrote {len(df)} symbols to {FEATHER_PATH}")